@@ -0,0 +1,30 @@
+"""
+Точечное обновление переменных в env-файле (touch.env)
+"""
+
+import re
+from pathlib import Path
+from typing import Union
+
+
+def set_env_var(path: Union[str, Path], key: str, value: str) -> bool:
+    """
+    Устанавливает KEY=value в env-файле: заменяет существующую строку или дописывает новую.
+    Если значение уже такое же, файл не перезаписывается. Возвращает True, если файл изменён.
+    """
+    path = Path(path)
+    content = path.read_text() if path.exists() else ""
+    line = f"{key}={value}"
+
+    m = re.search(rf"(?m)^{re.escape(key)}=.*$", content)
+    if m:
+        if m.group(0) == line:
+            return False
+        content = content[:m.start()] + line + content[m.end():]
+    else:
+        if content and not content.endswith("\n"):
+            content += "\n"
+        content += line + "\n"
+
+    path.write_text(content)
+    return True
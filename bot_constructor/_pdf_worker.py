@@ -0,0 +1,14 @@
+"""
+Воркер параллельного разбора PDF: импортирует только fitz,
+чтобы процессы пула (spawn) стартовали без telegram/openai/numpy из rag.py
+"""
+
+from typing import List
+
+import fitz  # PyMuPDF
+
+
+def pages_to_text(pdf_path: str, start: int, stop: int) -> List[str]:
+    """Текст страниц [start, stop); fitz.Document не потокобезопасен — каждый воркер открывает файл сам"""
+    with fitz.open(pdf_path) as doc:
+        return [doc.load_page(i).get_text("text") for i in range(start, stop)]
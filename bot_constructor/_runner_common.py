@@ -0,0 +1,162 @@
+"""
+Общие хелперы для скриптов запуска (run_dev, run_dev_multi, run_auth, run_webhook)
+"""
+
+import functools
+import os
+import socket
+import subprocess
+import time
+from pathlib import Path
+from typing import Iterable, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from _env_util import set_env_var
+
+ENV_FILE = "touch.env"
+NGROK_API_PORT = 4040
+NGROK_URL_TTL = 2.0  # сек: повторные запросы при старте не ходят в API ngrok
+NGROK_START_TIMEOUT = 10.0  # сек: ожидание, пока туннель получит public_url
+
+_ngrok_url_cache: Tuple[float, Optional[str]] = (0.0, None)
+
+
+def wait_port(host: str, port: int, timeout: float = 10.0) -> bool:
+    """Ждёт, пока порт начнёт принимать соединения (с экспоненциальной паузой)"""
+    deadline = time.monotonic() + timeout
+    delay = 0.05
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection((host, port), timeout=0.2).close()
+            return True
+        except OSError:
+            time.sleep(delay)
+            delay = min(delay * 1.7, 0.5)
+    return False
+
+
+def check_env_file(required_vars: Iterable[str], env_path: str = ENV_FILE) -> bool:
+    """Проверка файла окружения: файл есть и обязательные переменные заполнены"""
+    if not Path(env_path).exists():
+        print(f"❌ Файл {env_path} не найден!")
+        print(f"📝 Создайте файл {env_path} на основе touch.env.example")
+        return False
+
+    # Загружаем переменные
+    load_dotenv(env_path)
+
+    # Один проход: по одному чтению os.environ на переменную
+    values = {var: os.environ.get(var, "") for var in required_vars}
+    missing_vars = [var for var, value in values.items() if not value or value.startswith("your_")]
+
+    if missing_vars:
+        print(f"⚠️ В файле {env_path} не заполнены: {', '.join(missing_vars)}")
+        print("📝 Заполните все обязательные переменные окружения")
+        return False
+
+    print("✅ Файл окружения проверен")
+    return True
+
+
+def start_ngrok(port: int = 8000) -> Tuple[bool, Optional[subprocess.Popen]]:
+    """
+    Запуск ngrok для HTTPS.
+    Возвращает (ok, process); process — None, если ngrok уже был запущен или не стартовал.
+    """
+    print("🌐 Запуск ngrok...")
+
+    # Проверяем, не запущен ли уже ngrok
+    try:
+        result = subprocess.run(["pgrep", "ngrok"], capture_output=True, text=True)
+        if result.returncode == 0:
+            print("✅ ngrok уже запущен")
+            return True, None
+    except OSError:
+        pass
+
+    try:
+        process = subprocess.Popen(
+            ["ngrok", "http", str(port)],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        )
+    except FileNotFoundError:
+        print("⚠️ ngrok не установлен. Установите: brew install ngrok")
+        return False, None
+    except Exception as e:
+        print(f"❌ Ошибка запуска ngrok: {e}")
+        return False, None
+
+    # API ngrok открывается раньше, чем поднимается туннель: ждём именно public_url
+    if not get_ngrok_url(timeout=NGROK_START_TIMEOUT):
+        print("❌ Ошибка запуска ngrok: туннель не поднялся")
+        if process.poll() is None:
+            process.terminate()
+        return False, None
+
+    print("✅ ngrok запущен")
+    return True, process
+
+
+def get_ngrok_url(timeout: float = NGROK_START_TIMEOUT) -> Optional[str]:
+    """
+    Получение публичного URL ngrok (https-туннель приоритетнее).
+    Опрашивает API ngrok с экспоненциальной паузой, пока туннель не появится или не истечёт timeout.
+    """
+    global _ngrok_url_cache
+    fetched_at, cached = _ngrok_url_cache
+    if cached and time.monotonic() - fetched_at < NGROK_URL_TTL:
+        return cached
+
+    deadline = time.monotonic() + timeout
+    delay = 0.05
+    while True:
+        url = _fetch_ngrok_url()
+        if url:
+            _ngrok_url_cache = (time.monotonic(), url)
+            return url
+        if time.monotonic() + delay >= deadline:
+            return None
+        time.sleep(delay)
+        delay = min(delay * 1.7, 0.5)
+
+
+def _fetch_ngrok_url() -> Optional[str]:
+    """Один запрос к API ngrok; None, если API недоступен или туннелей ещё нет"""
+    try:
+        response = _ngrok_session().get(
+            f"http://127.0.0.1:{NGROK_API_PORT}/api/tunnels", timeout=(0.3, 1.0)
+        )
+        tunnels = response.json().get("tunnels", [])
+    except Exception:
+        return None
+
+    url = next((t["public_url"] for t in tunnels if t.get("proto") == "https"), None)
+    if url is None and tunnels:
+        url = tunnels[0]["public_url"]
+    return url
+
+
+@functools.lru_cache(maxsize=1)
+def _ngrok_session():
+    """Сессия для локального API ngrok (повторы делает цикл в get_ngrok_url)"""
+    import requests
+
+    return requests.Session()
+
+
+def update_env_with_ngrok(ngrok_url: Optional[str], env_path: str = ENV_FILE) -> bool:
+    """Обновление WEBAPP_URL в touch.env на ngrok URL"""
+    if not ngrok_url:
+        return False
+
+    try:
+        if set_env_var(env_path, "WEBAPP_URL", ngrok_url):
+            print(f"✅ Обновлен WEBAPP_URL: {ngrok_url}")
+        else:
+            print(f"✅ WEBAPP_URL уже актуален: {ngrok_url}")
+        return True
+    except OSError as e:
+        print(f"❌ Ошибка обновления {env_path}: {e}")
+        return False
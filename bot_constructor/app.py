@@ -1,6 +1,7 @@
 # app.py - SelinaAI Multi-Channel API
 from __future__ import annotations
 import os
+import hmac
 import json
 from pathlib import Path
 from typing import Dict, Any, Optional, List
@@ -27,6 +28,9 @@ BOT_TOKEN = os.getenv("TELEGRAM_TOKEN")
 if not BOT_TOKEN:
     raise RuntimeError("TELEGRAM_TOKEN не найден в окружении")
 
+# secret_token, переданный в setWebhook (setup_webhook.py); Telegram присылает его в заголовке
+TELEGRAM_WEBHOOK_SECRET = os.getenv("TG_WEBHOOK_SECRET")
+
 ROOT = Path(__file__).parent
 WEB_DIR = ROOT / "webapp"
 UPLOADS_DIR = ROOT / "uploads"
@@ -39,7 +43,8 @@ CHANNELS_CONFIG = {
     "telegram": {
         "token": os.getenv("TELEGRAM_TOKEN"),
         "webhook_url": os.getenv("WEBAPP_URL", "https://127.0.0.1:8000"),
-        "webhook_mode": os.getenv("TELEGRAM_WEBHOOK_MODE", "false").lower() == "true"
+        "webhook_mode": os.getenv("TELEGRAM_WEBHOOK_MODE", "false").lower() == "true",
+        "webhook_secret": TELEGRAM_WEBHOOK_SECRET
     },
     "whatsapp": {
         "access_token": os.getenv("WHATSAPP_ACCESS_TOKEN"),
@@ -504,6 +509,11 @@ async def telegram_webhook_verify(request: Request):
 @app.post("/webhook/telegram")
 async def telegram_webhook(request: Request):
     """Обработка webhook Telegram"""
+    if TELEGRAM_WEBHOOK_SECRET:
+        received = request.headers.get("X-Telegram-Bot-Api-Secret-Token", "")
+        if not hmac.compare_digest(received.encode(), TELEGRAM_WEBHOOK_SECRET.encode()):
+            raise HTTPException(status_code=403, detail="Invalid secret token")
+    
     try:
         data = await request.json()
         response = await channel_manager.process_message("telegram", data)
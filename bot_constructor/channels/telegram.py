@@ -23,6 +23,8 @@ class TelegramChannel(BaseChannel):
         self.app = None
         self.webhook_url = config.get("webhook_url", "")
         self.is_webhook_mode = config.get("webhook_mode", False)
+        # secret_token для setWebhook: иначе повторная регистрация сбросит секрет из setup_webhook.py
+        self.webhook_secret = config.get("webhook_secret")
         
         # Обработчики сообщений
         self.message_handlers = []
@@ -250,7 +252,7 @@ class TelegramChannel(BaseChannel):
     async def _setup_webhook(self):
         """Настройка webhook для продакшена"""
         webhook_url = await self.get_webhook_url()
-        await self.bot.set_webhook(url=webhook_url)
+        await self.bot.set_webhook(url=webhook_url, secret_token=self.webhook_secret)
         self.logger.info(f"Webhook установлен: {webhook_url}")
     
     async def _setup_polling(self):
@@ -50,6 +50,19 @@ class Document:
     is_processed: bool
 
 
+def _convert_timestamp(value: bytes) -> datetime:
+    """TIMESTAMP -> datetime: строка CURRENT_TIMESTAMP или число (expires_at хранится как unix-время)"""
+    text = value.decode()
+    try:
+        return datetime.fromisoformat(text)
+    except ValueError:
+        return datetime.fromtimestamp(float(text))
+
+
+# Явный конвертер вместо встроенного: встроенный объявлен устаревшим в Python 3.12
+sqlite3.register_converter("TIMESTAMP", _convert_timestamp)
+
+
 class Database:
     """Класс для работы с базой данных"""
     
@@ -57,9 +70,17 @@ class Database:
         self.db_path = Path(db_path)
         self.init_database()
     
+    def _connect(self) -> sqlite3.Connection:
+        """Открытие соединения с общими настройками"""
+        # TIMESTAMP-колонки сразу приходят как datetime (_convert_timestamp)
+        conn = sqlite3.connect(self.db_path, detect_types=sqlite3.PARSE_DECLTYPES)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA foreign_keys=ON")
+        return conn
+    
     def init_database(self):
         """Инициализация базы данных"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             conn.execute("""
                 CREATE TABLE IF NOT EXISTS users (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -117,13 +138,18 @@ class Database:
             conn.execute("CREATE INDEX IF NOT EXISTS idx_users_email ON users(email)")
             conn.execute("CREATE INDEX IF NOT EXISTS idx_agents_user_id ON ai_agents(user_id)")
             conn.execute("CREATE INDEX IF NOT EXISTS idx_documents_agent_id ON documents(agent_id)")
-            conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_token ON sessions(session_token)")
+            # Покрывающий индекс для validate_session: сторона sessions читается только из индекса
+            conn.execute("DROP INDEX IF EXISTS idx_sessions_token")
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_sessions_token_expires
+                ON sessions(session_token, expires_at, user_id)
+            """)
             
             conn.commit()
     
     def create_user(self, telegram_id: Optional[int] = None, email: Optional[str] = None, password: Optional[str] = None) -> int:
         """Создание нового пользователя"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             password_hash = None
             salt = None
             
@@ -141,8 +167,7 @@ class Database:
     
     def get_user_by_telegram_id(self, telegram_id: int) -> Optional[User]:
         """Получение пользователя по Telegram ID"""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
+        with self._connect() as conn:
             row = conn.execute("""
                 SELECT * FROM users WHERE telegram_id = ? AND is_active = TRUE
             """, (telegram_id,)).fetchone()
@@ -152,15 +177,14 @@ class Database:
                     id=row['id'],
                     telegram_id=row['telegram_id'],
                     email=row['email'],
-                    created_at=datetime.fromisoformat(row['created_at']),
+                    created_at=row['created_at'],
                     is_active=bool(row['is_active'])
                 )
             return None
     
     def get_user_by_email(self, email: str) -> Optional[User]:
         """Получение пользователя по email"""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
+        with self._connect() as conn:
             row = conn.execute("""
                 SELECT * FROM users WHERE email = ? AND is_active = TRUE
             """, (email,)).fetchone()
@@ -170,15 +194,14 @@ class Database:
                     id=row['id'],
                     telegram_id=row['telegram_id'],
                     email=row['email'],
-                    created_at=datetime.fromisoformat(row['created_at']),
+                    created_at=row['created_at'],
                     is_active=bool(row['is_active'])
                 )
             return None
     
     def authenticate_user(self, email: str, password: str) -> Optional[User]:
         """Аутентификация пользователя по email и паролю"""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
+        with self._connect() as conn:
             row = conn.execute("""
                 SELECT * FROM users WHERE email = ? AND is_active = TRUE
             """, (email,)).fetchone()
@@ -191,14 +214,14 @@ class Database:
                         id=row['id'],
                         telegram_id=row['telegram_id'],
                         email=row['email'],
-                        created_at=datetime.fromisoformat(row['created_at']),
+                        created_at=row['created_at'],
                         is_active=bool(row['is_active'])
                     )
             return None
     
     def create_session(self, user_id: int, expires_hours: int = 24) -> str:
         """Создание сессии для пользователя"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             session_token = secrets.token_urlsafe(32)
             expires_at = datetime.now().timestamp() + (expires_hours * 3600)
             
@@ -212,8 +235,7 @@ class Database:
     
     def validate_session(self, session_token: str) -> Optional[User]:
         """Проверка валидности сессии"""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
+        with self._connect() as conn:
             row = conn.execute("""
                 SELECT u.* FROM users u
                 JOIN sessions s ON u.id = s.user_id
@@ -225,21 +247,21 @@ class Database:
                     id=row['id'],
                     telegram_id=row['telegram_id'],
                     email=row['email'],
-                    created_at=datetime.fromisoformat(row['created_at']),
+                    created_at=row['created_at'],
                     is_active=bool(row['is_active'])
                 )
             return None
     
     def delete_session(self, session_token: str):
         """Удаление сессии"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             conn.execute("DELETE FROM sessions WHERE session_token = ?", (session_token,))
             conn.commit()
     
     def create_ai_agent(self, user_id: int, name: str, business_description: str, 
                         capabilities: str, tone: str = "дружелюбный") -> int:
         """Создание нового ИИ агента"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.execute("""
                 INSERT INTO ai_agents (user_id, name, business_description, capabilities, tone)
                 VALUES (?, ?, ?, ?, ?)
@@ -260,7 +282,7 @@ class Database:
         if not update_fields:
             return False
         
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             set_clause = ", ".join([f"{k} = ?" for k in update_fields.keys()])
             values = list(update_fields.values()) + [agent_id]
             
@@ -270,8 +292,7 @@ class Database:
     
     def get_user_agents(self, user_id: int) -> List[AIAgent]:
         """Получение всех агентов пользователя"""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
+        with self._connect() as conn:
             rows = conn.execute("""
                 SELECT * FROM ai_agents 
                 WHERE user_id = ? AND is_active = TRUE
@@ -289,7 +310,7 @@ class Database:
                     tone=row['tone'],
                     system_prompt=row['system_prompt'],
                     integrations=json.loads(row['integrations_json'] or '{}'),
-                    created_at=datetime.fromisoformat(row['created_at']),
+                    created_at=row['created_at'],
                     is_active=bool(row['is_active'])
                 ))
             
@@ -297,8 +318,7 @@ class Database:
     
     def get_agent_by_id(self, agent_id: int, user_id: int) -> Optional[AIAgent]:
         """Получение агента по ID (с проверкой владельца)"""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
+        with self._connect() as conn:
             row = conn.execute("""
                 SELECT * FROM ai_agents 
                 WHERE id = ? AND user_id = ? AND is_active = TRUE
@@ -314,14 +334,14 @@ class Database:
                     tone=row['tone'],
                     system_prompt=row['system_prompt'],
                     integrations=json.loads(row['integrations_json'] or '{}'),
-                    created_at=datetime.fromisoformat(row['created_at']),
+                    created_at=row['created_at'],
                     is_active=bool(row['is_active'])
                 )
             return None
     
     def add_document(self, agent_id: int, filename: str, file_path: str, file_type: str) -> int:
         """Добавление документа к агенту"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.execute("""
                 INSERT INTO documents (agent_id, filename, file_path, file_type)
                 VALUES (?, ?, ?, ?)
@@ -332,8 +352,7 @@ class Database:
     
     def get_agent_documents(self, agent_id: int) -> List[Document]:
         """Получение всех документов агента"""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
+        with self._connect() as conn:
             rows = conn.execute("""
                 SELECT * FROM documents 
                 WHERE agent_id = ? 
@@ -348,7 +367,7 @@ class Database:
                     filename=row['filename'],
                     file_path=row['file_path'],
                     file_type=row['file_type'],
-                    uploaded_at=datetime.fromisoformat(row['uploaded_at']),
+                    uploaded_at=row['uploaded_at'],
                     is_processed=bool(row['is_processed'])
                 ))
             
@@ -356,13 +375,13 @@ class Database:
     
     def mark_document_processed(self, document_id: int):
         """Отметить документ как обработанный"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             conn.execute("UPDATE documents SET is_processed = TRUE WHERE id = ?", (document_id,))
             conn.commit()
     
     def delete_document(self, document_id: int) -> bool:
         """Удаление документа"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             conn.execute("DELETE FROM documents WHERE id = ?", (document_id,))
             conn.commit()
             return True
@@ -86,7 +86,7 @@ async def ask_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def fallback_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await start_cmd(update, context)
 
-def main():
+def build_application():
     # Настраиваем резолвер ключей для RAG
     configure_key_resolver(lambda: OPENAI_KEY)
     
@@ -96,6 +96,10 @@ def main():
     app.add_handler(CommandHandler("ask", ask_cmd))
     app.add_handler(CommandHandler("upload", upload_doc))
     app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, fallback_text))
+    return app
+
+def main():
+    app = build_application()
     print("🤖 Бот запущен")
     app.run_polling()
 
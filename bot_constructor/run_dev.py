@@ -2,48 +2,68 @@
 """
 Development runner for BotCraft
 Запускает FastAPI сервер и Telegram бота
+
+По умолчанию оба сервиса работают в одном процессе и одном event loop.
+С флагом --reload — как раньше, отдельными процессами с автоперезагрузкой uvicorn.
 """
+import asyncio
 import subprocess
 import sys
-import time
 from pathlib import Path
 
-def main():
-    print("🚀 Запуск BotCraft для разработки...")
-    
-    # Проверяем наличие .env файла
-    env_file = Path("touch.env")
-    if not env_file.exists():
-        print("❌ Файл touch.env не найден!")
-        print("Создайте touch.env с вашими ключами:")
-        print("TELEGRAM_TOKEN=your_bot_token")
-        print("OPENAI_API_KEY=your_openai_key")
-        return 1
-    
+from _runner_common import wait_port
+
+async def serve_in_process():
+    """FastAPI (uvicorn.Server) и Telegram бот в одном event loop"""
+    import uvicorn
+    from main import build_application
+
+    server = uvicorn.Server(uvicorn.Config("app:app", host="127.0.0.1", port=8000, log_level="info"))
+    bot = build_application()
+
+    async with bot:
+        await bot.start()
+        await bot.updater.start_polling()
+        print("✅ Оба сервиса запущены!")
+        print("🌐 WebApp: http://127.0.0.1:8000")
+        print("📱 Бот: проверьте /start в Telegram")
+        print("\nНажмите Ctrl+C для остановки...")
+        try:
+            # uvicorn перехватывает Ctrl+C, завершает serve() и затем
+            # повторно поднимает сигнал — KeyboardInterrupt ловится в main()
+            await server.serve()
+        finally:
+            print("\n🛑 Остановка сервисов...")
+            await bot.updater.stop()
+            await bot.stop()
+
+def run_subprocesses():
+    """Режим --reload: uvicorn и бот отдельными процессами"""
     # Запускаем FastAPI сервер
     print("📡 Запуск FastAPI сервера на http://127.0.0.1:8000")
     api_process = subprocess.Popen([
-        sys.executable, "-m", "uvicorn", "app:app", 
+        sys.executable, "-m", "uvicorn", "app:app",
         "--host", "127.0.0.1", "--port", "8000", "--reload"
     ])
-    
-    # Ждем запуска сервера
-    time.sleep(3)
-    
+
+    # Ждем, пока сервер начнет принимать соединения
+    if not wait_port("127.0.0.1", 8000):
+        print("⚠️ FastAPI сервер пока не отвечает на порту 8000")
+
     # Запускаем Telegram бота
     print("🤖 Запуск Telegram бота...")
     bot_process = subprocess.Popen([sys.executable, "main.py"])
-    
+
     try:
         print("✅ Оба сервиса запущены!")
         print("🌐 WebApp: http://127.0.0.1:8000")
         print("📱 Бот: проверьте /start в Telegram")
         print("\nНажмите Ctrl+C для остановки...")
-        
+
         # Ждем завершения
         api_process.wait()
         bot_process.wait()
-        
+
     except KeyboardInterrupt:
         print("\n🛑 Остановка сервисов...")
         api_process.terminate()
@@ -51,7 +71,30 @@ def main():
         api_process.wait()
         bot_process.wait()
         print("✅ Все сервисы остановлены")
-    
+
+def main():
+    print("🚀 Запуск BotCraft для разработки...")
+
+    # Проверяем наличие .env файла
+    env_file = Path("touch.env")
+    if not env_file.exists():
+        print("❌ Файл touch.env не найден!")
+        print("Создайте touch.env с вашими ключами:")
+        print("TELEGRAM_TOKEN=your_bot_token")
+        print("OPENAI_API_KEY=your_openai_key")
+        return 1
+
+    if "--reload" in sys.argv:
+        run_subprocesses()
+    else:
+        print("📡 Запуск FastAPI сервера на http://127.0.0.1:8000")
+        print("🤖 Запуск Telegram бота...")
+        try:
+            asyncio.run(serve_in_process())
+        except KeyboardInterrupt:
+            pass
+        print("✅ Все сервисы остановлены")
+
     return 0
 
 if __name__ == "__main__":
@@ -6,36 +6,13 @@ SelinaAI Webhook Runner
 
 import os
 import sys
-import time
 import subprocess
-import signal
-from pathlib import Path
-from dotenv import load_dotenv
 
-def check_env_file():
-    """Проверка файла окружения"""
-    env_file = Path("touch.env")
-    if not env_file.exists():
-        print("❌ Файл touch.env не найден!")
-        return False
-    
-    # Загружаем переменные
-    load_dotenv("touch.env")
-    
-    # Проверяем обязательные переменные
-    required_vars = [
-        "TELEGRAM_TOKEN",
-        "OPENAI_API_KEY",
-        "WEBAPP_URL"
-    ]
-    
-    missing_vars = []
-    for var in required_vars:
-        if not os.getenv(var) or os.getenv(var).startswith("your_"):
-            missing_vars.append(var)
-    
-    if missing_vars:
-        print(f"⚠️ В файле touch.env не заполнены: {', '.join(missing_vars)}")
+from _runner_common import check_env_file, start_ngrok, get_ngrok_url, update_env_with_ngrok
+
+def check_webhook_env():
+    """Проверка файла окружения и webhook режима"""
+    if not check_env_file(["TELEGRAM_TOKEN", "OPENAI_API_KEY", "WEBAPP_URL"]):
         return False
     
     # Проверяем webhook режим
@@ -44,76 +21,9 @@ def check_env_file():
         print("⚠️ TELEGRAM_WEBHOOK_MODE должен быть true для webhook режима")
         return False
     
-    print("✅ Файл окружения проверен")
     print(f"🔧 Webhook режим: {'ВКЛЮЧЕН' if webhook_mode else 'ВЫКЛЮЧЕН'}")
     return True
 
-def start_ngrok():
-    """Запуск ngrok для HTTPS"""
-    print("🌐 Запуск ngrok...")
-    
-    try:
-        # Проверяем, не запущен ли уже ngrok
-        result = subprocess.run(["pgrep", "ngrok"], capture_output=True, text=True)
-        if result.returncode == 0:
-            print("✅ ngrok уже запущен")
-            return True
-    except:
-        pass
-    
-    try:
-        subprocess.Popen(
-            ["ngrok", "http", "8000"],
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL
-        )
-        time.sleep(3)
-        print("✅ ngrok запущен")
-        return True
-    except Exception as e:
-        print(f"❌ Ошибка запуска ngrok: {e}")
-        return False
-
-def get_ngrok_url():
-    """Получение публичного URL ngrok"""
-    try:
-        import requests
-        response = requests.get("http://127.0.0.1:4040/api/tunnels")
-        data = response.json()
-        
-        for tunnel in data.get("tunnels", []):
-            if tunnel["proto"] == "https":
-                return tunnel["public_url"]
-        
-        return None
-    except:
-        return None
-
-def update_env_with_ngrok(ngrok_url):
-    """Обновление touch.env с ngrok URL"""
-    if not ngrok_url:
-        return False
-    
-    try:
-        env_file = Path("touch.env")
-        content = env_file.read_text()
-        
-        # Обновляем WEBAPP_URL
-        if "WEBAPP_URL=" in content:
-            content = content.replace(
-                "WEBAPP_URL=https://127.0.0.1:8000",
-                f"WEBAPP_URL={ngrok_url}"
-            )
-        else:
-            content += f"\nWEBAPP_URL={ngrok_url}\n"
-        
-        env_file.write_text(content)
-        print(f"✅ Обновлен WEBAPP_URL: {ngrok_url}")
-        return True
-    except Exception as e:
-        print(f"❌ Ошибка обновления touch.env: {e}")
-        return False
-
 def setup_webhook():
     """Настройка webhook для Telegram бота"""
     print("🔧 Настройка webhook...")
@@ -154,11 +64,12 @@ def main():
     print("=" * 50)
     
     # Проверяем файл окружения
-    if not check_env_file():
+    if not check_webhook_env():
         return
     
     # Запускаем ngrok
-    if not start_ngrok():
+    ngrok_ok, _ = start_ngrok()
+    if not ngrok_ok:
         print("❌ Не удалось запустить ngrok")
         return
     
@@ -3,138 +3,235 @@
 Скрипт настройки webhook для Telegram бота
 """
 
+import functools
+import json
 import os
+import secrets
+import sys
+import time
+import types
 import requests
+from requests.adapters import HTTPAdapter
+from requests.exceptions import RequestException
+from urllib3.util.retry import Retry
 from dotenv import load_dotenv
 
-# Загружаем переменные окружения
-load_dotenv("touch.env")
+from _env_util import set_env_var
 
-def setup_telegram_webhook():
-    """Настройка webhook для Telegram бота"""
+# orjson (опционально) быстрее сериализует тело запроса и разбирает ответы API
+try:
+    import orjson
+    _json_loads = orjson.loads
+    _json_dumps = orjson.dumps
+except ImportError:
+    _json_loads = json.loads
+    def _json_dumps(obj) -> bytes:
+        return json.dumps(obj, separators=(",", ":")).encode()
+
+TELEGRAM_API = "https://api.telegram.org"
+_JSON_HEADERS = {"Content-Type": "application/json"}
+_ALLOWED_UPDATES = ("message", "callback_query", "inline_query")
+# Поля getWebhookInfo, которые используются скриптом
+_WEBHOOK_INFO_FIELDS = ("url", "last_error_message", "pending_update_count", "last_error_date")
+WEBHOOK_INFO_TTL = 2.0  # сек: повторные запросы при настройке берут ответ из кэша
+
+# Сетевые ошибки и некорректный JSON в ответе; ошибки в коде не перехватываем
+_API_ERRORS = (RequestException, ValueError)
+
+# token -> (время получения, result из getWebhookInfo)
+_webhook_info_cache = {}
+
+# Одна сессия на все вызовы Telegram API: TLS-соединение переиспользуется,
+# временные ошибки и 429 повторяются внутри адаптера с экспоненциальной паузой.
+# setWebhook/deleteWebhook идемпотентны, поэтому POST тоже повторяем
+_RETRY = Retry(
+    total=5,
+    backoff_factor=0.5,
+    status_forcelist=[429, 500, 502, 503, 504],
+    allowed_methods=frozenset(["GET", "POST"]),
+    respect_retry_after_header=True,
+    raise_on_status=False,  # после последней попытки отдаём ответ в _call
+)
+_SESSION = requests.Session()
+_SESSION.mount(
+    "https://",
+    HTTPAdapter(pool_connections=1, pool_maxsize=4, max_retries=_RETRY),
+)
+
+def _max_connections(raw):
+    """TG_MAX_CONN: Telegram принимает 1..100 одновременных соединений (по умолчанию 40)"""
+    if not raw:
+        return 100
+    try:
+        return min(max(int(raw), 1), 100)
+    except ValueError:
+        print(f"⚠️ Некорректный TG_MAX_CONN={raw!r}, используется 100")
+        return 100
+
+@functools.lru_cache(maxsize=1)
+def _config():
+    """Переменные окружения из touch.env (файл читается один раз)"""
+    load_dotenv("touch.env")
+    return types.SimpleNamespace(
+        token=os.environ.get("TELEGRAM_TOKEN"),
+        url=os.environ.get("WEBAPP_URL"),
+        max_connections=_max_connections(os.environ.get("TG_MAX_CONN")),
+        drop_pending_updates=os.environ.get("TG_DROP_PENDING") == "1",
+        webhook_secret=os.environ.get("TG_WEBHOOK_SECRET"),
+    )
+
+def _new_webhook_secret():
+    """Генерирует secret_token для webhook и сохраняет его в touch.env как TG_WEBHOOK_SECRET"""
+    secret = secrets.token_urlsafe(32)
+    try:
+        set_env_var("touch.env", "TG_WEBHOOK_SECRET", secret)
+        print("🔑 Сгенерирован TG_WEBHOOK_SECRET и сохранён в touch.env")
+    except OSError as e:
+        print(f"⚠️ Не удалось сохранить TG_WEBHOOK_SECRET в touch.env: {e}")
+        print(f"🔑 Добавьте вручную: TG_WEBHOOK_SECRET={secret}")
+    return secret
+
+def _call(http_method, api_method, body=None):
+    """
+    Вызов метода Telegram Bot API.
+    Возвращает (ok, result): result — JSON-ответ API или None при HTTP-ошибке.
+    """
+    response = _SESSION.request(
+        http_method,
+        f"{TELEGRAM_API}/bot{_config().token}/{api_method}",
+        data=_json_dumps(body) if body is not None else None,
+        headers=_JSON_HEADERS if body is not None else None,
+        timeout=10,
+    )
+    
+    if response.status_code != 200:
+        print(f"❌ HTTP ошибка: {response.status_code}")
+        print(f"📝 Ответ: {response.text}")
+        return False, None
+    
+    result = _json_loads(response.content)
+    return bool(result.get("ok")), result
+
+def setup_telegram_webhook(verify=False):
+    """
+    Настройка webhook для Telegram бота.
+    Ответ setWebhook с ok=true уже подтверждает установку; с verify=True
+    дополнительно запрашивается и печатается getWebhookInfo.
+    """
     
     # Получаем токен и URL
-    bot_token = os.getenv("TELEGRAM_TOKEN")
-    webhook_url = os.getenv("WEBAPP_URL")
+    cfg = _config()
     
-    if not bot_token:
+    if not cfg.token:
         print("❌ TELEGRAM_TOKEN не найден в touch.env")
         return False
     
-    if not webhook_url:
+    if not cfg.url:
         print("❌ WEBAPP_URL не найден в touch.env")
         return False
     
     # Формируем webhook URL
-    webhook_endpoint = f"{webhook_url}/webhook/telegram"
+    webhook_endpoint = f"{cfg.url}/webhook/telegram"
+    
+    # Telegram будет присылать его в заголовке X-Telegram-Bot-Api-Secret-Token
+    webhook_secret = cfg.webhook_secret or _new_webhook_secret()
     
     print(f"🤖 Настройка webhook для бота...")
     print(f"📱 Webhook URL: {webhook_endpoint}")
     
     try:
         # Устанавливаем webhook
-        response = requests.post(
-            f"https://api.telegram.org/bot{bot_token}/setWebhook",
-            json={
-                "url": webhook_endpoint,
-                "allowed_updates": ["message", "callback_query", "inline_query"]
-            }
-        )
+        ok, result = _call("POST", "setWebhook", {
+            "url": webhook_endpoint,
+            "allowed_updates": _ALLOWED_UPDATES,
+            "max_connections": cfg.max_connections,
+            "drop_pending_updates": cfg.drop_pending_updates,
+            "secret_token": webhook_secret,
+        })
         
-        if response.status_code == 200:
-            result = response.json()
-            if result.get("ok"):
-                print("✅ Webhook успешно установлен!")
-                print(f"📊 Результат: {result}")
-                
-                # Проверяем текущий webhook
-                webhook_info = requests.get(
-                    f"https://api.telegram.org/bot{bot_token}/getWebhookInfo"
-                )
-                
-                if webhook_info.status_code == 200:
-                    info = webhook_info.json()
-                    if info.get("ok"):
-                        print(f"📋 Информация о webhook:")
-                        print(f"   URL: {info['result'].get('url', 'Не установлен')}")
-                        print(f"   Ошибки: {info['result'].get('last_error_message', 'Нет')}")
-                        print(f"   Обновления: {info['result'].get('pending_update_count', 0)}")
-                
-                return True
-            else:
+        if not ok:
+            if result is not None:
                 print(f"❌ Ошибка установки webhook: {result}")
-                return False
-        else:
-            print(f"❌ HTTP ошибка: {response.status_code}")
-            print(f"📝 Ответ: {response.text}")
             return False
+        
+        # Webhook изменился — закэшированная информация устарела
+        _webhook_info_cache.clear()
+        
+        print("✅ Webhook успешно установлен!")
+        print(f"📊 Результат: {result}")
+        
+        # Проверяем текущий webhook
+        if verify:
+            info = get_webhook_info()
+            if info is not None:
+                print_webhook_info(info)
+        
+        return True
             
-    except Exception as e:
+    except _API_ERRORS as e:
         print(f"❌ Ошибка при настройке webhook: {e}")
         return False
 
 def remove_telegram_webhook():
     """Удаление webhook для Telegram бота"""
     
-    bot_token = os.getenv("TELEGRAM_TOKEN")
-    if not bot_token:
+    if not _config().token:
         print("❌ TELEGRAM_TOKEN не найден в touch.env")
         return False
     
     try:
-        response = requests.post(
-            f"https://api.telegram.org/bot{bot_token}/deleteWebhook"
-        )
+        ok, result = _call("POST", "deleteWebhook")
         
-        if response.status_code == 200:
-            result = response.json()
-            if result.get("ok"):
-                print("✅ Webhook успешно удален!")
-                return True
-            else:
-                print(f"❌ Ошибка удаления webhook: {result}")
-                return False
-        else:
-            print(f"❌ HTTP ошибка: {response.status_code}")
-            return False
+        if ok:
+            _webhook_info_cache.clear()
+            print("✅ Webhook успешно удален!")
+        elif result is not None:
+            print(f"❌ Ошибка удаления webhook: {result}")
+        return ok
             
-    except Exception as e:
+    except _API_ERRORS as e:
         print(f"❌ Ошибка при удалении webhook: {e}")
         return False
 
 def get_webhook_info():
-    """Получение информации о текущем webhook"""
+    """
+    Информация о текущем webhook: поля _WEBHOOK_INFO_FIELDS из getWebhookInfo или None при ошибке.
+    Ответ кэшируется на WEBHOOK_INFO_TTL секунд.
+    """
     
-    bot_token = os.getenv("TELEGRAM_TOKEN")
+    bot_token = _config().token
     if not bot_token:
         print("❌ TELEGRAM_TOKEN не найден в touch.env")
-        return False
+        return None
+    
+    cached = _webhook_info_cache.get(bot_token)
+    if cached and time.monotonic() - cached[0] < WEBHOOK_INFO_TTL:
+        return cached[1]
     
     try:
-        response = requests.get(
-            f"https://api.telegram.org/bot{bot_token}/getWebhookInfo"
-        )
+        ok, result = _call("GET", "getWebhookInfo")
         
-        if response.status_code == 200:
-            result = response.json()
-            if result.get("ok"):
-                info = result["result"]
-                print("📋 Информация о webhook:")
-                print(f"   URL: {info.get('url', 'Не установлен')}")
-                print(f"   Ошибки: {info.get('last_error_message', 'Нет')}")
-                print(f"   Обновления: {info.get('pending_update_count', 0)}")
-                print(f"   Время ошибки: {info.get('last_error_date', 'Нет')}")
-                return True
-            else:
+        if not ok:
+            if result is not None:
                 print(f"❌ Ошибка получения информации: {result}")
-                return False
-        else:
-            print(f"❌ HTTP ошибка: {response.status_code}")
-            return False
+            return None
+        
+        raw_info = result["result"]
+        info = {key: raw_info[key] for key in _WEBHOOK_INFO_FIELDS if key in raw_info}
+        _webhook_info_cache[bot_token] = (time.monotonic(), info)
+        return info
             
-    except Exception as e:
+    except _API_ERRORS as e:
         print(f"❌ Ошибка при получении информации: {e}")
-        return False
+        return None
+
+def print_webhook_info(info):
+    """Вывод информации о webhook"""
+    print("📋 Информация о webhook:")
+    print(f"   URL: {info.get('url', 'Не установлен')}")
+    print(f"   Ошибки: {info.get('last_error_message', 'Нет')}")
+    print(f"   Обновления: {info.get('pending_update_count', 0)}")
+    print(f"   Время ошибки: {info.get('last_error_date', 'Нет')}")
 
 if __name__ == "__main__":
     print("🔧 Настройка Telegram Webhook")
@@ -142,11 +239,13 @@ if __name__ == "__main__":
     
     # Показываем текущую информацию
     print("\n📋 Текущий статус webhook:")
-    get_webhook_info()
+    current_info = get_webhook_info()
+    if current_info is not None:
+        print_webhook_info(current_info)
     
     # Устанавливаем webhook
     print("\n🔧 Установка webhook...")
-    if setup_telegram_webhook():
+    if setup_telegram_webhook(verify="--verify" in sys.argv):
         print("\n✅ Webhook настроен успешно!")
         print("🚀 Теперь бот будет получать обновления через webhook")
     else:
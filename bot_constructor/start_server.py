@@ -7,10 +7,13 @@ import uvicorn
 import os
 import sys
 
-# Добавляем текущую директорию в путь
-sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+_HERE = os.path.dirname(os.path.abspath(__file__))
 
 if __name__ == "__main__":
+    # Добавляем директорию скрипта в путь (дочерние процессы uvicorn получают sys.path от родителя)
+    if _HERE not in sys.path:
+        sys.path.insert(0, _HERE)
+    
     print("🚀 Запуск SelinaAI Multi-Channel API...")
     print("📱 Поддержка: Telegram, WhatsApp, Instagram")
     print("🔐 Система авторизации: активна")
@@ -20,10 +23,24 @@ if __name__ == "__main__":
     print("🌐 WebApp: http://127.0.0.1:8000/webapp")
     print("⏹️ Нажмите Ctrl+C для остановки...")
     
+    # Автоперезагрузка только для разработки: RELOAD=1
+    reload = os.getenv("RELOAD", "").strip().lower() in ("1", "true", "yes")
+    reload_options = {}
+    if reload:
+        # Следим только за кодом проекта, без загрузок, статики webapp и кэшей
+        reload_options = {
+            "reload_dirs": [_HERE],
+            "reload_excludes": ["uploads/*", "webapp/*", "__pycache__/*", ".venv/*"],
+        }
+    
+    # Воркер один (по умолчанию uvicorn): каналы (polling бота / регистрация webhook)
+    # запускаются в startup приложения, и несколько воркеров конфликтовали бы за токен бота.
+    # loop/http по умолчанию "auto" — uvloop и httptools из uvicorn[standard], если установлены
     uvicorn.run(
         "app:app",
         host="127.0.0.1",
         port=8000,
-        reload=True,
+        reload=reload,
+        **reload_options,
         log_level="info"
     )
@@ -3,63 +3,42 @@
 Тест настройки SelinaAI
 Проверяет импорты и базовую функциональность
 """
+import functools
+import importlib.util
+import mmap
+import os
+import re
 import sys
 from pathlib import Path
 
+# (название для вывода, имя модуля)
+REQUIRED_MODULES = [
+    ("FastAPI", "fastapi"),
+    ("python-telegram-bot", "telegram"),
+    ("OpenAI", "openai"),
+    ("PyMuPDF", "fitz"),
+    ("python-docx", "docx"),
+    ("openpyxl", "openpyxl"),
+    ("NumPy", "numpy"),
+]
+
+def _present(module_name):
+    """Модуль установлен: find_spec находит его, не выполняя код модуля"""
+    return importlib.util.find_spec(module_name) is not None
+
 def test_imports():
-    """Тестирует импорт всех модулей"""
+    """Тестирует наличие всех зависимостей"""
     print("🧪 Тестирую импорты...")
     
-    try:
-        import fastapi
-        print("✅ FastAPI импортирован")
-    except ImportError as e:
-        print(f"❌ FastAPI: {e}")
-        return False
-    
-    try:
-        import telegram
-        print("✅ python-telegram-bot импортирован")
-    except ImportError as e:
-        print(f"❌ python-telegram-bot: {e}")
-        return False
-    
-    try:
-        import openai
-        print("✅ OpenAI импортирован")
-    except ImportError as e:
-        print(f"❌ OpenAI: {e}")
-        return False
-    
-    try:
-        import fitz
-        print("✅ PyMuPDF импортирован")
-    except ImportError as e:
-        print(f"❌ PyMuPDF: {e}")
-        return False
-    
-    try:
-        import docx
-        print("✅ python-docx импортирован")
-    except ImportError as e:
-        print(f"❌ python-docx: {e}")
-        return False
-    
-    try:
-        import openpyxl
-        print("✅ openpyxl импортирован")
-    except ImportError as e:
-        print(f"❌ openpyxl: {e}")
-        return False
-    
-    try:
-        import numpy
-        print("✅ NumPy импортирован")
-    except ImportError as e:
-        print(f"❌ NumPy: {e}")
-        return False
-    
-    return True
+    success = True
+    for title, module_name in REQUIRED_MODULES:
+        if _present(module_name):
+            print(f"✅ {title} установлен")
+        else:
+            print(f"❌ {title}: No module named '{module_name}'")
+            success = False
+    
+    return success
 
 def test_local_modules():
     """Тестирует импорт локальных модулей"""
@@ -88,12 +67,40 @@ def test_local_modules():
     
     return True
 
+# Заглушки обязательных ключей (из touch.env.example и подсказки ниже)
+PLACEHOLDERS = (
+    "your_telegram_bot_token_here",
+    "your_openai_api_key_here",
+    "your_bot_token",
+    "your_openai_key",
+)
+# Одно регулярное выражение на все заглушки: файл просматривается за один проход
+_PLACEHOLDER_RE = re.compile(b"|".join(re.escape(p.encode()) for p in PLACEHOLDERS))
+
+def _find_placeholder(path):
+    """Первая найденная заглушка в файле или None (поиск по mmap, пустой файл mmap не поддерживает)"""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return None
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            m = _PLACEHOLDER_RE.search(mm)
+            return m.group(0).decode() if m else None
+
+@functools.lru_cache(maxsize=8)
+def _placeholder_in_env(path, mtime_ns, size):
+    """Результат проверки кэшируется, пока у файла не изменились mtime и размер"""
+    return _find_placeholder(path)
+
 def test_env_file():
     """Проверяет наличие конфигурационного файла"""
     print("\n🧪 Проверяю конфигурацию...")
     
     env_file = Path("touch.env")
-    if not env_file.exists():
+    try:
+        st = env_file.stat()
+    except FileNotFoundError:
+        st = None
+    if st is None:
         print("❌ Файл touch.env не найден!")
         print("Создайте touch.env с вашими ключами:")
         print("TELEGRAM_TOKEN=your_bot_token")
@@ -102,10 +109,10 @@ def test_env_file():
     
     print("✅ touch.env найден")
     
-    # Проверяем содержимое
-    content = env_file.read_text()
-    if "your_telegram_bot_token_here" in content:
-        print("⚠️  Замените placeholder'ы в touch.env на реальные ключи")
+    # Проверяем содержимое: поиск по байтам через mmap, без декодирования файла
+    placeholder = _placeholder_in_env(str(env_file), st.st_mtime_ns, st.st_size)
+    if placeholder:
+        print(f"⚠️  Замените placeholder'ы в touch.env на реальные ключи (найден: {placeholder})")
         return False
     
     print("✅ Ключи настроены")